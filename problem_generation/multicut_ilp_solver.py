@@ -1,7 +1,10 @@
 import gurobipy as gp
 import networkx as nx
 import numpy as np
+import argparse
+import copy
 import json
+import os
 import random
 import math
 from gurobipy import GRB
@@ -16,6 +19,21 @@ import matplotlib.pyplot as plt
 from itertools import combinations
 
 
+# outcomes of a budgeted multicut solve
+SOLVE_OPTIMAL = "optimal"
+SOLVE_GAP_REACHED = "gap_reached"
+SOLVE_FEASIBLE_WITH_GAP = "feasible_with_gap"
+SOLVE_NO_SOLUTION = "no_solution"
+
+# what to do with instances whose optimality could not be proven within the budget.
+# Instances that stopped at the mip_gap target are not proven either and are handled
+# the same way, so a positive mip_gap can only produce unranked or retried instances.
+# UNPROVEN_RETRY queues them for a deferred second solve with a larger budget.
+UNPROVEN_DROP = "drop"
+UNPROVEN_RETRY = "retry"
+UNPROVEN_UNRANKED = "unranked"
+
+
 def solve_multicut(graph: nx.Graph, costs: dict, log: bool = True):
     """
     This method solves the minimum cost multicut problem for the given graph and edge costs.
@@ -24,10 +42,53 @@ def solve_multicut(graph: nx.Graph, costs: dict, log: bool = True):
     :param log: flag indicating whether gurobi should print out the log
     :return: dict that assigns a 0-1 labeling to the edges where 1 indicates that the edge is cut.
     """
+    multicut, objective, _, _ = solve_multicut_budgeted(graph, costs, log=log)
+    return multicut, objective
+
+
+def solve_multicut_budgeted(
+    graph: nx.Graph,
+    costs: dict,
+    time_limit: float = None,
+    node_limit: float = None,
+    work_limit: float = None,
+    mip_gap: float = None,
+    threads: int = None,
+    log: bool = True,
+):
+    """
+    Solves the minimum cost multicut problem like solve_multicut, but stops once the
+    time limit, the node limit, the work limit or the relative gap target is reached.
+    Limits that are None are not set, i.e. gurobi's defaults apply.
+    :param graph: undirected simple graph.
+    :param costs: dict that assigns an integer cost to each edge in the graph.
+    :param time_limit: wall clock limit in seconds.
+    :param node_limit: maximum number of explored branch-and-bound nodes.
+    :param work_limit: deterministic work limit in gurobi work units (roughly seconds).
+        Unlike time_limit it stops at the same point on every machine.
+    :param mip_gap: relative gap at which the solver may stop.
+    :param threads: number of solver threads. Fixing it keeps results reproducible
+        across machines with different core counts.
+    :param log: flag indicating whether gurobi should print out the log
+    :return: tuple (multicut, objective, status, bound). multicut and objective are None
+        if no feasible solution was found. status is one of SOLVE_OPTIMAL,
+        SOLVE_GAP_REACHED (stopped at the mip_gap target), SOLVE_FEASIBLE_WITH_GAP
+        (stopped at a limit) and SOLVE_NO_SOLUTION. bound is the best proven lower bound.
+    """
 
     # create IPL model
     model = gp.Model()
     model.setParam("OutputFlag", 1 if log else 0)
+    if time_limit is not None:
+        model.setParam("TimeLimit", time_limit)
+    if node_limit is not None:
+        model.setParam("NodeLimit", node_limit)
+    if work_limit is not None:
+        model.setParam("WorkLimit", work_limit)
+    if mip_gap is not None:
+        model.setParam("MIPGap", mip_gap)
+    if threads is not None:
+        model.setParam("Threads", threads)
     # add the variables to the model
     variables = model.addVars(costs.keys(), obj=costs, vtype=GRB.BINARY, name="e")
     for i, j in list(variables.keys()):
@@ -68,10 +129,22 @@ def solve_multicut(graph: nx.Graph, costs: dict, log: bool = True):
     model.Params.LazyConstraints = 1
     model.optimize(separate_cycle_inequalities)
 
+    bound = model.ObjBound
+    if model.SolCount == 0:
+        return None, None, SOLVE_NO_SOLUTION, bound
+
     # return the 0-1 edge labeling by rounding the solution
     solution = model.getAttr("X", variables)
     multicut = {e: 1 if x_e > 0.5 else 0 for e, x_e in solution.items()}
-    return multicut, model.ObjVal
+    objective = model.ObjVal
+    # costs are integral, so the incumbent is optimal once the bound rounds up to it
+    if model.Status != GRB.OPTIMAL:
+        status = SOLVE_FEASIBLE_WITH_GAP
+    elif math.ceil(bound - 1e-6) >= objective:
+        status = SOLVE_OPTIMAL
+    else:
+        status = SOLVE_GAP_REACHED
+    return multicut, objective, status, bound
 
 
 def generate_random_prob_distribution(prob_ranges=List[tuple[float]]):
@@ -450,6 +523,10 @@ def promote_edges_to_connect_high_cost(G, costs):
     return new_costs
 
 
+def utc_timestamp():
+    return datetime.utcnow().isoformat() + "Z"  # ISO 8601 format with UTC 'Z'
+
+
 def count_edges_by_cost(graph_data_list):
     cost_count = defaultdict(int)
 
@@ -467,7 +544,17 @@ def generate_random_graph(
     available_costs: List[int],
     density_range: tuple[float],
     use_special_edges: bool,
+    solve_budget: dict = None,
+    created_at: str = None,
 ):
+    """
+    Generate a random planar-ish graph with random edge costs and solve it.
+    :param solve_budget: keyword arguments (time_limit, node_limit, work_limit, mip_gap,
+        threads) for solve_multicut_budgeted. None solves to proven optimality.
+    :param created_at: ISO 8601 timestamp stored in the graph. Defaults to now.
+    :return: tuple (graph_data, status). graph_data is None if the graph was rejected.
+        If status is not SOLVE_OPTIMAL, graph_data holds the best found cut.
+    """
     density = random.uniform(*density_range)
     cost_probs = generate_random_prob_distribution(cost_probs_ranges)
 
@@ -510,7 +597,7 @@ def generate_random_graph(
     possible_pairs = list(combinations(graph.nodes, 2))
 
     if not nx.is_connected(graph):
-        return None
+        return None, None
 
     costs = {}
     count = defaultdict(int)
@@ -523,9 +610,11 @@ def generate_random_graph(
     costs = promote_edges_to_connect_high_cost(graph, costs)
 
     # Solve the multicut problem for the graph
-    multicut, optimal_cost = solve_multicut(graph, costs, log=False)
+    multicut, optimal_cost, status, bound = solve_multicut_budgeted(
+        graph, costs, log=False, **(solve_budget or {})
+    )
 
-    if optimal_cost < 0:
+    if status != SOLVE_NO_SOLUTION and optimal_cost < 0:
         graph_data = {
             "Nodes": [
                 {"Id": node_id, "Position": {"x": x, "y": y}}
@@ -548,136 +637,566 @@ def generate_random_graph(
             ],
             "OptimalCost": int(optimal_cost),
             "BestAchievedCost": 0,
-            "CreatedAt": datetime.utcnow().isoformat()
-            + "Z",  # ISO 8601 format with UTC 'Z',
+            "CreatedAt": created_at or utc_timestamp(),
         }
-        return graph_data
+        if status != SOLVE_OPTIMAL:
+            graph_data["LowerBound"] = math.ceil(bound - 1e-6)
+        return graph_data, status
     else:
-        return None
-
-
-def generate_graphs_node_size(args):
-    (
-        graph_count_per_size,
-        node_count,
-        cost_probs_ranges,
-        available_costs,
-        density_range,
-        use_special_edges,
-    ) = args
-    local_graphs = []
-    while len(local_graphs) < graph_count_per_size:
-        graph_data = generate_random_graph(
-            node_count,
-            cost_probs_ranges,
-            available_costs,
-            density_range,
-            use_special_edges,
+        return None, status
+
+
+def graph_from_graph_data(graph_data):
+    """Rebuild the networkx graph and the cost dict from serialized graph data."""
+    graph = nx.Graph()
+    for node in graph_data["Nodes"]:
+        graph.add_node(
+            node["Id"], pos=(node["Position"]["x"], node["Position"]["y"])
         )
-        if graph_data:
-            local_graphs.append(graph_data)
-    return (node_count, local_graphs)
+    costs = {}
+    for edge in graph_data["Edges"]:
+        graph.add_edge(edge["FromNodeId"], edge["ToNodeId"])
+        costs[edge["FromNodeId"], edge["ToNodeId"]] = edge["Cost"]
+    return graph, costs
 
 
-def generate(
-    generate_per_size: int,
-    select_per_size: int,
-    graph_size_range: tuple[int],
-    cost_probs_ranges: List[tuple[float]],
-    available_costs: List[int],
-    density_range: tuple[float],
-    use_special_edges: bool,
-):
+def count_solve_status(summary, status, prefix=""):
+    add_summary(summary, {prefix + status: 1})
+    if status in (SOLVE_FEASIBLE_WITH_GAP, SOLVE_NO_SOLUTION):
+        add_summary(summary, {prefix + "budget_hits": 1})
+
+
+def add_summary(summary, other):
+    for key, value in other.items():
+        summary[key] = summary.get(key, 0) + value
+
+
+def seed_task(run_seed, variant, node_count, seed):
+    """Seed the global random generators so a graph does not depend on where it is generated."""
+    task_seed = random.Random(f"{run_seed}:{variant}:{node_count}:{seed}").getrandbits(32)
+    random.seed(task_seed)
+    np.random.seed(task_seed)
+
+
+def plan_run(run_config, seeds_per_unit, allow_time_limit=False):
     """
-    Generate n graphs and solve the multicut problem for each.
-    Save the results as a JSON file.
-    :param n: number of graphs to generate.
-    :param graph_size: number of nodes per graph.
+    Partition a run into (variant, node_count, seed range) work units.
+    :param run_config: run parameters, see RUN_CONFIG.
+    :param seeds_per_unit: number of seeds per work unit.
+    :param allow_time_limit: accept budgets with a time_limit. Their results depend on
+        the machine, so a sharded run would no longer match a single host run.
+    :return: plan dict with the normalized config and the list of work units.
     """
-    min_node_count, max_node_count = graph_size_range
+    for budget_name in ("solve_budget", "retry_budget"):
+        budget = run_config[budget_name] or {}
+        if budget.get("time_limit") is not None and not allow_time_limit:
+            raise ValueError(
+                f"{budget_name} sets a time_limit, which is not reproducible across "
+                "hosts. Use work_limit or node_limit instead."
+            )
+    # round trip through json so the config compares equal to the one stored in shard files
+    config = json.loads(json.dumps(run_config))
+    if config["created_at"] is None:
+        config["created_at"] = utc_timestamp()
+    units = []
+    for variant, params in sorted(config["variants"].items()):
+        min_node_count, max_node_count = params["graph_size_range"]
+        for node_count in reversed(range(min_node_count, max_node_count + 1)):
+            for seed_start in range(0, params["generate_per_size"], seeds_per_unit):
+                units.append(
+                    {
+                        "variant": variant,
+                        "node_count": node_count,
+                        "seed_start": seed_start,
+                        "seed_stop": min(
+                            seed_start + seeds_per_unit, params["generate_per_size"]
+                        ),
+                    }
+                )
+    return {"Config": config, "Units": units}
 
-    graphs_data = defaultdict(lambda: defaultdict(list))
-    args_list = [
-        (
-            generate_per_size,
+
+def retry_unproven_graph(args):
+    """Re-solve an unproven instance with the (larger) retry budget."""
+    key, graph_data, retry_budget = args
+    graph_data = copy.deepcopy(graph_data)
+    graph, costs = graph_from_graph_data(graph_data)
+    multicut, optimal_cost, status, bound = solve_multicut_budgeted(
+        graph, costs, log=False, **(retry_budget or {})
+    )
+    if status != SOLVE_OPTIMAL:
+        return key, None, status
+    for edge in graph_data["Edges"]:
+        edge["OptimalCut"] = (
+            multicut.get((edge["FromNodeId"], edge["ToNodeId"]), 0) == 1
+        )
+    graph_data["OptimalCost"] = int(optimal_cost)
+    graph_data.pop("LowerBound", None)
+    return key, graph_data, status
+
+
+def generate_graphs_for_seed(config, variant, node_count, seed):
+    """
+    Generate graphs from one seed until one of them is solved to proven optimality or
+    max_solves_per_seed solves were spent on the seed.
+    :return: result dict with the ranked graphs, the unproven graphs that are kept
+        according to the unproven policy and the solve summary of this seed.
+    """
+    params = config["variants"][variant]
+    seed_task(config["seed"], variant, node_count, seed)
+    graphs = []
+    unproven_graphs = []
+    summary = defaultdict(int)
+    solves = 0
+    while not graphs:
+        if solves >= config["max_solves_per_seed"]:
+            summary["exhausted_seeds"] += 1
+            break
+        graph_data, status = generate_random_graph(
             node_count,
-            cost_probs_ranges,
-            available_costs,
-            density_range,
-            use_special_edges,
+            params["cost_probs_ranges"],
+            params["available_costs"],
+            params["density_range"],
+            params["use_special_edges"],
+            config["solve_budget"],
+            config["created_at"],
         )
-        for node_count in reversed(range(min_node_count, max_node_count + 1))
-    ]
-    with Pool(processes=cpu_count()) as pool:
-        for node_count, graphs in tqdm(
-            pool.imap_unordered(generate_graphs_node_size, args_list),
-            total=len(args_list),
-            desc="Generating graphs",
+        if status is not None:
+            solves += 1
+            count_solve_status(summary, status)
+        if not graph_data:
+            continue
+        if status == SOLVE_OPTIMAL:
+            graphs.append(graph_data)
+        elif config["unproven_policy"] == UNPROVEN_DROP or (
+            config["unproven_policy"] == UNPROVEN_UNRANKED
+            and len(unproven_graphs) >= params["select_per_size"]
         ):
-            graphs_data[node_count] = graphs
+            summary["dropped"] += 1
+        else:
+            unproven_graphs.append(graph_data)
+    return {
+        "Seed": seed,
+        "Graphs": graphs,
+        "Unproven": unproven_graphs,
+        "Summary": dict(summary),
+    }
 
-    # Prepare data for C# serialization
-    info_list = [raw_level_difficutly_stats(g) for graph_list in graphs_data.values() for g in graph_list]
-    min_max_stats = calc_min_max_stats(info_list)
-    for graph_list in graphs_data.values():
-        for g in graph_list:
-            g["Difficulty"] = calc_level_difficulty(g, min_max_stats)
 
-    selected_graphs = []
-    for graph_list in graphs_data.values():
-        sorted_graphs = sorted(graph_list, key=lambda g: g["Difficulty"], reverse=True)
-        selected_graphs += sorted_graphs[:select_per_size]
-    
-    # sort seelcted graphs
-    return selected_graphs
+def run_work_unit(args):
+    """
+    Generate the graphs of all seeds of a work unit.
+    :return: shard dict describing the run, the unit and the results per seed.
+    """
+    config, unit = args
+    results = [
+        generate_graphs_for_seed(config, unit["variant"], unit["node_count"], seed)
+        for seed in range(unit["seed_start"], unit["seed_stop"])
+    ]
+    return {"Config": config, "Unit": unit, "Results": results}
 
 
+def iter_retry_shards(shards, retry_budget, processes=None):
+    """
+    Re-solve the unproven graphs of the given shards with the retry budget. Retries are
+    a separate step that runs once the regular shards are done, so slow retries never
+    hold back a shard. The shards are not changed.
+    :param processes: size of the pool used for the retries, this process if None.
+    :return: iterator over one retry shard per shard with unproven graphs, each yielded
+        as soon as all of its graphs are retried. A retry shard holds the graphs that
+        are proven optimal now and the retry summary of every seed with unproven graphs.
+    """
+    retry_args = [
+        ((shard_idx, result_idx), g, retry_budget)
+        for shard_idx, shard in enumerate(shards)
+        for result_idx, result in enumerate(shard["Results"])
+        for g in result["Unproven"]
+    ]
+    remaining = defaultdict(int)
+    for (shard_idx, _), _, _ in retry_args:
+        remaining[shard_idx] += 1
+    retry_results = {}
+    for shard_idx, shard in enumerate(shards):
+        for result_idx, result in enumerate(shard["Results"]):
+            if result["Unproven"]:
+                retry_results[shard_idx, result_idx] = {
+                    "Seed": result["Seed"],
+                    "Graphs": [],
+                    "Summary": {},
+                }
 
-def main():
-    output_path = "Assets/Resources/graphList.json"
-    graph_with_special_edges = generate(
-        generate_per_size=9*30,
-        select_per_size=9,
-        graph_size_range=(5, 64),
-        cost_probs_ranges=[
-            (0.22, 0.22),
-            (0.22, 0.22),
-            (0.12, 0.12),
-            (0.22, 0.22),
-            (0.22, 0.22),
-        ],
-        available_costs=[-2, -1, 0, 1, 2],
-        density_range=(0.1, 0.7),
-        use_special_edges=True
-    )
-    graph_without_special_edges = generate(
-        generate_per_size=1*30,
-        select_per_size=1,
-        graph_size_range=(5, 64),
-        cost_probs_ranges=[
-            (0.22, 0.22),
-            (0.22, 0.22),
-            (0.12, 0.12),
-            (0.22, 0.22),
-            (0.22, 0.22),
-        ],
-        available_costs=[-2, -1, 0, 1, 2],
-        density_range=(0.1, 0.7),
-        use_special_edges=False
-    )
+    def retried_shard(shard_idx):
+        shard = shards[shard_idx]
+        results = [
+            retry_results[shard_idx, result_idx]
+            for result_idx in range(len(shard["Results"]))
+            if (shard_idx, result_idx) in retry_results
+        ]
+        return {"Config": shard["Config"], "Unit": shard["Unit"], "Results": results}
+
+    def apply(retried):
+        # imap keeps the order of retry_args, so the graphs of a shard come in one run
+        for key, graph_data, status in retried:
+            result = retry_results[key]
+            add_summary(result["Summary"], {"retried": 1})
+            count_solve_status(result["Summary"], status, prefix="retry_")
+            if graph_data:
+                add_summary(result["Summary"], {"retry_proven": 1})
+                result["Graphs"].append(graph_data)
+            else:
+                add_summary(result["Summary"], {"retry_unproven": 1})
+            shard_idx = key[0]
+            remaining[shard_idx] -= 1
+            if remaining[shard_idx] == 0:
+                yield retried_shard(shard_idx)
+
+    if processes and retry_args:
+        with Pool(processes=processes) as pool:
+            yield from apply(
+                tqdm(
+                    pool.imap(retry_unproven_graph, retry_args),
+                    total=len(retry_args),
+                    desc="Retrying unproven graphs",
+                )
+            )
+    else:
+        yield from apply(map(retry_unproven_graph, retry_args))
+
+
+def retry_shards(shards, retry_budget, processes=None):
+    """Same as iter_retry_shards, but returns the retry shards as a list."""
+    return list(iter_retry_shards(shards, retry_budget, processes))
+
+
+def shard_file_name(unit, prefix="shard"):
+    return (prefix + "-{variant}-{node_count}-{seed_start}-{seed_stop}.json").format(**unit)
+
+
+def write_shard(path, shard):
+    # write to a temporary file first so a merge never sees half written shards
+    with open(path + ".tmp", "w") as f:
+        json.dump(shard, f)
+    os.replace(path + ".tmp", path)
+
+
+def run_shard(plan, unit_index, shard_dir):
+    """
+    Run a single work unit of the plan and write its self-describing shard file.
+    Unproven graphs stay in the shard, see retry_shard_dir.
+    :return: path of the written shard file.
+    """
+    shard = run_work_unit((plan["Config"], plan["Units"][unit_index]))
+    path = os.path.join(shard_dir, shard_file_name(shard["Unit"]))
+    write_shard(path, shard)
+    return path
+
+
+def retry_shard_dir(plan, shard_dir, processes=None):
+    """
+    Retry the unproven graphs of all shard files in shard_dir and write a retry shard
+    file next to each shard that has some, as soon as its graphs are retried. Shards
+    that already have a retry shard file are skipped, so an interrupted retry step
+    resumes with the shards that were not finished. Does nothing
+    unless the plan uses UNPROVEN_RETRY.
+    :return: paths of the written retry shard files.
+    """
+    if plan["Config"]["unproven_policy"] != UNPROVEN_RETRY:
+        return []
+    shards = [
+        shard
+        for shard in load_shards(shard_dir)
+        if not os.path.exists(
+            os.path.join(shard_dir, shard_file_name(shard["Unit"], prefix="retry"))
+        )
+    ]
+    paths = []
+    for retried_shard in iter_retry_shards(
+        shards, plan["Config"]["retry_budget"], processes
+    ):
+        path = os.path.join(shard_dir, shard_file_name(retried_shard["Unit"], prefix="retry"))
+        write_shard(path, retried_shard)
+        paths.append(path)
+    return paths
+
+
+def load_shards(shard_dir, prefix="shard"):
+    shards = []
+    for name in sorted(os.listdir(shard_dir)):
+        if name.startswith(prefix + "-") and name.endswith(".json"):
+            with open(os.path.join(shard_dir, name)) as f:
+                shards.append(json.load(f))
+    return shards
+
+
+def collect_seed_results(config, shards):
+    """Map (variant, node_count, seed) to the first result of that seed in the shards."""
+    config_key = json.dumps(config, sort_keys=True)
+    seed_results = {}
+    for shard in shards:
+        if json.dumps(shard["Config"], sort_keys=True) != config_key:
+            raise ValueError(f"Shard {shard_file_name(shard['Unit'])} belongs to a different run")
+        unit = shard["Unit"]
+        for result in shard["Results"]:
+            seed_results.setdefault(
+                (unit["variant"], unit["node_count"], result["Seed"]), result
+            )
+    return seed_results
+
+
+def merge_shards(plan, shards, retried_shards=()):
+    """
+    Merge work unit results into the final level lists. Seeds that were run more than
+    once and graphs with identical nodes and edges are only used once. Difficulty is
+    normalized over all graphs of a variant, so the result does not depend on how the
+    run was split up.
+    :param plan: plan the shards were generated from, see plan_run.
+    :param shards: shard dicts, from run_work_unit or loaded from shard files.
+    :param retried_shards: retry shards, from retry_shards or loaded from retry shard
+        files. Required for every seed with unproven graphs under UNPROVEN_RETRY.
+    :return: tuple (selected_graphs, unranked_graphs, summary) where summary counts the
+        solve outcomes and budget hits of the run.
+    """
+    config = plan["Config"]
+    seed_results = collect_seed_results(config, shards)
+    retry_results = collect_seed_results(config, retried_shards)
+
+    expected_seeds = {
+        (unit["variant"], unit["node_count"], seed)
+        for unit in plan["Units"]
+        for seed in range(unit["seed_start"], unit["seed_stop"])
+    }
+    missing_seeds = expected_seeds - seed_results.keys()
+    if missing_seeds:
+        raise ValueError(f"{len(missing_seeds)} seeds of the plan have no shard, e.g. {min(missing_seeds)}")
+
+    summary = defaultdict(int)
+    selected_graphs = []
+    unranked_graphs = []
+    for variant in sorted(config["variants"]):
+        select_per_size = config["variants"][variant]["select_per_size"]
+        graphs_data = defaultdict(list)
+        unranked_data = defaultdict(list)
+        seen_graphs = set()
+        for key in sorted(expected_seeds):
+            if key[0] != variant:
+                continue
+            _, node_count, _ = key
+            result = seed_results[key]
+            add_summary(summary, result["Summary"])
+            graphs = result["Graphs"]
+            unproven_graphs = result["Unproven"]
+            if config["unproven_policy"] == UNPROVEN_RETRY and unproven_graphs:
+                if key not in retry_results:
+                    raise ValueError(f"Unproven graphs of seed {key} were not retried")
+                add_summary(summary, retry_results[key]["Summary"])
+                graphs = graphs + retry_results[key]["Graphs"]
+                unproven_graphs = []
+            for graph_list, target in (
+                (graphs, graphs_data),
+                (unproven_graphs, unranked_data),
+            ):
+                for g in graph_list:
+                    graph_key = json.dumps([g["Nodes"], g["Edges"]], sort_keys=True)
+                    if graph_key in seen_graphs:
+                        summary["duplicates"] += 1
+                        continue
+                    seen_graphs.add(graph_key)
+                    target[node_count].append(g)
+
+        # Prepare data for C# serialization. Unranked graphs only carry the best found
+        # cut, so they are normalized on their own to keep the ranked levels unaffected.
+        for data, selected in (
+            (graphs_data, selected_graphs),
+            (unranked_data, unranked_graphs),
+        ):
+            graphs = [g for graph_list in data.values() for g in graph_list]
+            info_list = [raw_level_difficutly_stats(g) for g in graphs]
+            min_max_stats = calc_min_max_stats(info_list)
+            for g in graphs:
+                g["Difficulty"] = calc_level_difficulty(g, min_max_stats)
+
+            for graph_list in data.values():
+                sorted_graphs = sorted(
+                    graph_list, key=lambda g: g["Difficulty"], reverse=True
+                )
+                selected += sorted_graphs[:select_per_size]
 
-    selected_graphs = graph_with_special_edges + graph_without_special_edges
     selected_graphs = sorted(selected_graphs, key=lambda x: x["Difficulty"])
     for idx, graph in enumerate(selected_graphs, start=1):
         graph["Name"] = str(idx)
+    unranked_graphs = sorted(unranked_graphs, key=lambda x: x["Difficulty"])
+    summary["unranked"] += len(unranked_graphs)
+    return selected_graphs, unranked_graphs, dict(summary)
+
+
+def generate(plan, processes: int = None):
+    """
+    Generate all work units of the plan on this machine and merge them.
+    :param plan: plan of the run, see plan_run.
+    :param processes: number of worker processes, defaults to the cpu count.
+    :return: same as merge_shards.
+    """
+    config = plan["Config"]
+    processes = processes or cpu_count()
+    args_list = [(config, unit) for unit in plan["Units"]]
+    with Pool(processes=processes) as pool:
+        shards = list(
+            tqdm(
+                pool.imap_unordered(run_work_unit, args_list),
+                total=len(args_list),
+                desc="Generating graphs",
+            )
+        )
+    retried_shards = []
+    if config["unproven_policy"] == UNPROVEN_RETRY:
+        retried_shards = retry_shards(shards, config["retry_budget"], processes)
+    return merge_shards(plan, shards, retried_shards)
+
+
+# parameters of a generation run. Every variant is normalized and selected on its own.
+# Budgets use the deterministic work limit and a single thread, so every host solves
+# a graph the same way and a sharded run matches a single host run.
+RUN_CONFIG = {
+    "seed": 0,
+    "created_at": None,
+    "max_solves_per_seed": 20,
+    "solve_budget": {"work_limit": 60, "node_limit": None, "mip_gap": None, "threads": 1},
+    "unproven_policy": UNPROVEN_RETRY,
+    "retry_budget": {"work_limit": 600, "node_limit": None, "mip_gap": None, "threads": 1},
+    "variants": {
+        "special_edges": {
+            "generate_per_size": 9 * 30,
+            "select_per_size": 9,
+            "graph_size_range": (5, 64),
+            "cost_probs_ranges": [
+                (0.22, 0.22),
+                (0.22, 0.22),
+                (0.12, 0.12),
+                (0.22, 0.22),
+                (0.22, 0.22),
+            ],
+            "available_costs": [-2, -1, 0, 1, 2],
+            "density_range": (0.1, 0.7),
+            "use_special_edges": True,
+        },
+        "no_special_edges": {
+            "generate_per_size": 1 * 30,
+            "select_per_size": 1,
+            "graph_size_range": (5, 64),
+            "cost_probs_ranges": [
+                (0.22, 0.22),
+                (0.22, 0.22),
+                (0.12, 0.12),
+                (0.22, 0.22),
+                (0.22, 0.22),
+            ],
+            "available_costs": [-2, -1, 0, 1, 2],
+            "density_range": (0.1, 0.7),
+            "use_special_edges": False,
+        },
+    },
+}
+SEEDS_PER_UNIT = 30
+OUTPUT_PATH = "Assets/Resources/graphList.json"
+# the game does not load unranked levels, so they are kept out of Assets/Resources
+UNRANKED_OUTPUT_PATH = "problem_generation/unrankedGraphList.json"
+
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
 
+
+def write_results(selected_graphs, unranked_graphs, summary, output_path, unranked_output_path):
     # statisitics
     print("number of selected graphs:", len(selected_graphs))
     print("cost count:", count_edges_by_cost(selected_graphs))
+    print("solve summary:", summary)
 
     # Save to a JSON file
     with open(output_path, "w") as f:
         json.dump({"Graphs": selected_graphs}, f, indent=4)
+    # always written, so no unranked list of an earlier run is left behind
+    with open(unranked_output_path, "w") as f:
+        json.dump({"Graphs": unranked_graphs}, f, indent=4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the multicut levels of the game.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    plan_parser = subparsers.add_parser("plan", help="partition a run into work units")
+    plan_parser.add_argument("plan_path")
+    plan_parser.add_argument("--seeds-per-unit", type=int, default=SEEDS_PER_UNIT)
+    plan_parser.add_argument("--seed", type=int, default=RUN_CONFIG["seed"], help="seed of the run")
+    plan_parser.add_argument("--created-at", help="ISO 8601 timestamp stored in the graphs, now if omitted")
+
+    run_parser = subparsers.add_parser("run", help="generate the whole run on this machine (default)")
+    run_parser.add_argument("--plan", dest="plan_path", help="plan file, a new plan is made if omitted")
+
+    shard_parser = subparsers.add_parser("shard", help="run work units and write a shard file per unit")
+    shard_parser.add_argument("plan_path")
+    shard_parser.add_argument("shard_dir")
+    shard_parser.add_argument("--unit", type=int, action="append", help="index of a unit to run, all units if omitted")
+    shard_parser.add_argument("--processes", type=int, default=1, help="local processes standing in for hosts")
+
+    retry_parser = subparsers.add_parser("retry", help="retry the unproven graphs of the shard files")
+    retry_parser.add_argument("plan_path")
+    retry_parser.add_argument("shard_dir")
+    retry_parser.add_argument("--processes", type=int, default=1)
+
+    merge_parser = subparsers.add_parser("merge", help="merge shard files into the level lists")
+    merge_parser.add_argument("plan_path")
+    merge_parser.add_argument("shard_dir")
+
+    for p in (run_parser, merge_parser):
+        p.add_argument("--output", default=OUTPUT_PATH)
+        p.add_argument("--unranked-output", default=UNRANKED_OUTPUT_PATH)
+    args = parser.parse_args()
+
+    if args.command == "plan":
+        run_config = dict(RUN_CONFIG, seed=args.seed, created_at=args.created_at)
+        with open(args.plan_path, "w") as f:
+            json.dump(plan_run(run_config, args.seeds_per_unit), f, indent=4)
+    elif args.command == "shard":
+        plan = load_json(args.plan_path)
+        os.makedirs(args.shard_dir, exist_ok=True)
+        unit_indices = args.unit if args.unit else range(len(plan["Units"]))
+        invalid_units = [i for i in unit_indices if not 0 <= i < len(plan["Units"])]
+        if invalid_units:
+            parser.error(f"unit indices {invalid_units} are not in the plan, which has {len(plan['Units'])} units")
+        with Pool(processes=args.processes) as pool:
+            paths = pool.starmap(
+                run_shard, [(plan, i, args.shard_dir) for i in unit_indices]
+            )
+        print("number of written shards:", len(paths))
+    elif args.command == "retry":
+        plan = load_json(args.plan_path)
+        paths = retry_shard_dir(plan, args.shard_dir, args.processes)
+        print("number of written retry shards:", len(paths))
+    elif args.command == "merge":
+        plan = load_json(args.plan_path)
+        write_results(
+            *merge_shards(
+                plan,
+                load_shards(args.shard_dir),
+                load_shards(args.shard_dir, prefix="retry"),
+            ),
+            args.output,
+            args.unranked_output,
+        )
+    else:
+        plan_path = getattr(args, "plan_path", None)
+        plan = (
+            load_json(plan_path)
+            if plan_path
+            else plan_run(RUN_CONFIG, SEEDS_PER_UNIT, allow_time_limit=True)
+        )
+        write_results(
+            *generate(plan),
+            getattr(args, "output", OUTPUT_PATH),
+            getattr(args, "unranked_output", UNRANKED_OUTPUT_PATH),
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,212 @@
+import copy
+import json
+import random
+
+import pytest
+
+pytest.importorskip("gurobipy")
+pytest.importorskip("networkx")
+
+import multicut_ilp_solver as m
+
+
+def fake_solve_multicut_budgeted(graph, costs, node_limit=None, **kwargs):
+    """
+    Deterministic stand-in for gurobi: cut all negative edges. Every third graph hits
+    the budget unless the node limit is large, so retries have work to do.
+    """
+    multicut = {}
+    for (u, v), cost in costs.items():
+        multicut[u, v] = multicut[v, u] = 1 if cost < 0 else 0
+    objective = sum(cost for cost in costs.values() if cost < 0)
+    if len(costs) % 3 == 0 and node_limit < 100:
+        return multicut, objective, m.SOLVE_FEASIBLE_WITH_GAP, objective - 1
+    return multicut, objective, m.SOLVE_OPTIMAL, objective
+
+
+@pytest.fixture
+def plan(monkeypatch):
+    monkeypatch.setattr(m, "solve_multicut_budgeted", fake_solve_multicut_budgeted)
+    config = copy.deepcopy(m.RUN_CONFIG)
+    config["created_at"] = "2026-01-01T00:00:00Z"
+    config["solve_budget"] = {"node_limit": 1, "threads": 1}
+    config["retry_budget"] = {"node_limit": 1000, "threads": 1}
+    for params in config["variants"].values():
+        params["graph_size_range"] = (8, 10)
+        params["generate_per_size"] = 3
+        params["select_per_size"] = 2
+    return m.plan_run(config, seeds_per_unit=2)
+
+
+def random_complete_graph(node_count, seed):
+    graph = m.nx.complete_graph(node_count)
+    rnd = random.Random(seed)
+    costs = {e: rnd.choice([-2, -1, 0, 1, 2]) for e in graph.edges}
+    return graph, costs
+
+
+@pytest.mark.parametrize(
+    "node_count, seed, budget, expected",
+    [
+        (8, 1, {}, (-17, m.SOLVE_OPTIMAL, -17)),
+        (8, 1, {"mip_gap": 0.9}, (-16, m.SOLVE_GAP_REACHED, -18)),
+        (12, 3, {"node_limit": 1}, (-4, m.SOLVE_FEASIBLE_WITH_GAP, -6)),
+        (12, 1, {"node_limit": 1}, (None, m.SOLVE_NO_SOLUTION, -21)),
+    ],
+)
+def test_solve_multicut_budgeted_status(node_count, seed, budget, expected):
+    graph, costs = random_complete_graph(node_count, seed)
+    multicut, objective, status, bound = m.solve_multicut_budgeted(
+        graph, costs, threads=1, log=False, **budget
+    )
+
+    assert (objective, status, round(bound)) == expected
+    if status == m.SOLVE_NO_SOLUTION:
+        assert multicut is None
+    else:
+        cut_cost = sum(costs[e] for e in costs if multicut[e] == 1)
+        assert cut_cost == objective
+
+
+@pytest.mark.parametrize("bound, lower_bound", [(-5.5, -5), (-6.0000001, -6), (-6.0, -6)])
+def test_lower_bound_is_rounded_up(monkeypatch, bound, lower_bound):
+    def solve(graph, costs, **kwargs):
+        multicut = {e: 1 for e in costs}
+        return multicut, -1, m.SOLVE_FEASIBLE_WITH_GAP, bound
+
+    monkeypatch.setattr(m, "solve_multicut_budgeted", solve)
+    m.seed_task(0, "test", 8, 0)
+    graph_data = None
+    while graph_data is None:
+        graph_data, status = m.generate_random_graph(
+            8, [(0.2, 0.2)] * 5, [-2, -1, 0, 1, 2], (0.3, 0.7), False
+        )
+
+    assert status == m.SOLVE_FEASIBLE_WITH_GAP
+    assert graph_data["LowerBound"] == lower_bound
+
+
+def run_sharded(plan, shard_dir):
+    for unit_index in range(len(plan["Units"])):
+        m.run_shard(plan, unit_index, shard_dir)
+    m.retry_shard_dir(plan, shard_dir)
+    return m.load_shards(shard_dir), m.load_shards(shard_dir, prefix="retry")
+
+
+def test_sharded_run_matches_single_host_run(plan, tmp_path):
+    single_host = m.generate(plan, processes=2)
+    shards, retried_shards = run_sharded(plan, str(tmp_path))
+    sharded = m.merge_shards(plan, shards, retried_shards)
+
+    assert json.dumps(sharded) == json.dumps(single_host)
+    assert single_host[2]["retried"] > 0
+
+
+def test_retry_budget_hits_are_counted(plan):
+    plan["Config"]["retry_budget"] = {"node_limit": 1, "threads": 1}
+    summary = m.generate(plan, processes=2)[2]
+
+    assert summary["retried"] == summary["retry_feasible_with_gap"] > 0
+    assert summary["retry_budget_hits"] == summary["retry_unproven"] == summary["retried"]
+    assert "retry_proven" not in summary
+    assert "dropped" not in summary
+
+
+def test_drop_policy_discards_unproven_graphs(plan):
+    plan["Config"]["unproven_policy"] = m.UNPROVEN_DROP
+    selected_graphs, unranked_graphs, summary = m.generate(plan, processes=2)
+
+    assert summary["dropped"] > 0
+    assert summary["budget_hits"] >= summary["dropped"]
+    assert "retried" not in summary
+    assert unranked_graphs == []
+    assert all("LowerBound" not in g for g in selected_graphs)
+
+
+def test_unranked_policy_keeps_unproven_graphs_apart(plan, tmp_path):
+    plan["Config"]["unproven_policy"] = m.UNPROVEN_UNRANKED
+    selected_graphs, unranked_graphs, summary = m.generate(plan, processes=2)
+
+    assert unranked_graphs
+    assert summary["unranked"] == len(unranked_graphs)
+    assert "retried" not in summary
+    assert all("LowerBound" not in g for g in selected_graphs)
+    assert all(g["LowerBound"] == g["OptimalCost"] - 1 for g in unranked_graphs)
+
+    output_path = str(tmp_path / "graphList.json")
+    unranked_output_path = str(tmp_path / "unrankedGraphList.json")
+    m.write_results(selected_graphs, unranked_graphs, summary, output_path, unranked_output_path)
+    assert m.load_json(unranked_output_path) == {"Graphs": unranked_graphs}
+    # a run without unranked graphs replaces the list of the earlier run
+    m.write_results(selected_graphs, [], summary, output_path, unranked_output_path)
+    assert m.load_json(unranked_output_path) == {"Graphs": []}
+
+
+def test_seeds_give_up_after_max_solves(plan):
+    plan["Config"]["max_solves_per_seed"] = 1
+    plan["Config"]["unproven_policy"] = m.UNPROVEN_DROP
+    summary = m.generate(plan, processes=2)[2]
+
+    assert summary["exhausted_seeds"] > 0
+
+
+def test_merge_ignores_duplicated_shards(plan, tmp_path):
+    shards, retried_shards = run_sharded(plan, str(tmp_path))
+    expected = json.dumps(m.merge_shards(plan, copy.deepcopy(shards), retried_shards))
+
+    duplicated = copy.deepcopy(shards) + copy.deepcopy(shards[:2])
+    assert json.dumps(m.merge_shards(plan, duplicated, retried_shards)) == expected
+
+
+def test_merge_rejects_missing_seeds(plan, tmp_path):
+    shards, retried_shards = run_sharded(plan, str(tmp_path))
+    with pytest.raises(ValueError, match="no shard"):
+        m.merge_shards(plan, shards[1:], retried_shards)
+
+
+def test_merge_rejects_missing_retries(plan, tmp_path):
+    shards, retried_shards = run_sharded(plan, str(tmp_path))
+    assert retried_shards
+    with pytest.raises(ValueError, match="not retried"):
+        m.merge_shards(plan, shards, [])
+
+
+def test_interrupted_retry_step_resumes(plan, tmp_path, monkeypatch):
+    shard_dir = str(tmp_path)
+    for unit_index in range(len(plan["Units"])):
+        m.run_shard(plan, unit_index, shard_dir)
+    expected = m.retry_shards(m.load_shards(shard_dir), plan["Config"]["retry_budget"])
+    assert len(expected) > 1
+
+    retry_unproven_graph = m.retry_unproven_graph
+    last_unit = expected[-1]["Unit"]
+
+    def interrupted_retry(args):
+        (shard_idx, _), _, _ = args
+        if m.load_shards(shard_dir)[shard_idx]["Unit"] == last_unit:
+            raise RuntimeError("interrupted")
+        return retry_unproven_graph(args)
+
+    monkeypatch.setattr(m, "retry_unproven_graph", interrupted_retry)
+    with pytest.raises(RuntimeError):
+        m.retry_shard_dir(plan, shard_dir)
+    assert len(m.load_shards(shard_dir, prefix="retry")) == len(expected) - 1
+
+    monkeypatch.setattr(m, "retry_unproven_graph", retry_unproven_graph)
+    assert len(m.retry_shard_dir(plan, shard_dir)) == 1
+    assert m.load_shards(shard_dir, prefix="retry") == expected
+
+
+def test_retry_step_only_runs_under_retry_policy(plan, tmp_path):
+    plan["Config"]["unproven_policy"] = m.UNPROVEN_UNRANKED
+    for unit_index in range(len(plan["Units"])):
+        m.run_shard(plan, unit_index, str(tmp_path))
+
+    assert m.retry_shard_dir(plan, str(tmp_path)) == []
+    assert m.load_shards(str(tmp_path), prefix="retry") == []
+
+
+def test_plan_rejects_time_limit():
+    config = dict(m.RUN_CONFIG, solve_budget={"time_limit": 60})
+    with pytest.raises(ValueError, match="time_limit"):
+        m.plan_run(config, seeds_per_unit=2)